@@ -0,0 +1,19 @@
+// Service worker of mkdocs-glightbox, written while the service_worker option
+// is off. Browsers which registered the worker of an earlier build update to
+// this one, which removes the caches and the worker itself.
+self.addEventListener("install", () => self.skipWaiting());
+
+self.addEventListener("activate", (event) => {
+  event.waitUntil(
+    caches
+      .keys()
+      .then((names) =>
+        Promise.all(
+          names
+            .filter((name) => name.startsWith("glightbox-"))
+            .map((name) => caches.delete(name))
+        )
+      )
+      .then(() => self.registration.unregister())
+  );
+});
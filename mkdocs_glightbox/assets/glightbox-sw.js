@@ -0,0 +1,125 @@
+// Service worker of mkdocs-glightbox, generated at build time
+const VERSION = "__VERSION__";
+const PRECACHE = __PRECACHE__;
+const MAX_IMAGE_BYTES = __MAX_IMAGE_BYTES__;
+const ASSETS_CACHE = `glightbox-assets-${VERSION}`;
+const IMAGES_CACHE = `glightbox-images-${VERSION}`;
+// least recently used first, stored in the images cache
+const INDEX_URL = new URL("__glightbox_lru__", self.registration.scope).href;
+const PRECACHE_URLS = PRECACHE.map((path) => new URL(path, self.location).href);
+
+// updates of the LRU index run one after another
+let queue = Promise.resolve();
+function serialize(task) {
+  queue = queue.then(task, task);
+  return queue;
+}
+
+self.addEventListener("install", (event) => {
+  event.waitUntil(
+    caches
+      .open(ASSETS_CACHE)
+      // bypass the http cache, which may hold the assets of an earlier build
+      .then((cache) =>
+        cache.addAll(PRECACHE_URLS.map((url) => new Request(url, { cache: "reload" })))
+      )
+      .then(() => self.skipWaiting())
+  );
+});
+
+self.addEventListener("activate", (event) => {
+  event.waitUntil(
+    caches
+      .keys()
+      .then((names) =>
+        Promise.all(
+          names
+            .filter((name) => name.startsWith("glightbox-"))
+            .filter((name) => name !== ASSETS_CACHE && name !== IMAGES_CACHE)
+            .map((name) => caches.delete(name))
+        )
+      )
+      .then(() => self.clients.claim())
+  );
+});
+
+self.addEventListener("fetch", (event) => {
+  const request = event.request;
+  if (request.method !== "GET") {
+    return;
+  }
+  // assets are matched with their version query
+  if (PRECACHE_URLS.includes(request.url)) {
+    event.respondWith(
+      caches
+        .match(request, { cacheName: ASSETS_CACHE })
+        .then((response) => response || fetch(request))
+    );
+  } else if (request.destination === "image") {
+    event.respondWith(
+      caches.match(request, { cacheName: IMAGES_CACHE }).then((response) => {
+        if (!response) {
+          return fetch(request);
+        }
+        // stale while revalidate, changed images are served on the next view
+        event.waitUntil(serialize(() => store(request.url, true)));
+        return response;
+      })
+    );
+  }
+});
+
+// the page posts the lightbox targets which have been opened
+self.addEventListener("message", (event) => {
+  const data = event.data || {};
+  if (data.type === "glightbox-cache" && data.url) {
+    event.waitUntil(serialize(() => store(data.url)));
+  }
+});
+
+async function readIndex(cache) {
+  const response = await cache.match(INDEX_URL);
+  return response ? response.json() : [];
+}
+
+async function store(url, revalidate = false) {
+  const cache = await caches.open(IMAGES_CACHE);
+  if (!revalidate && (await cache.match(url))) {
+    return touch(url, null);
+  }
+  const response = await fetch(url).catch(() => null);
+  if (!response || !response.ok) {
+    return touch(url, null);
+  }
+  const size = (await response.clone().blob()).size;
+  if (size > MAX_IMAGE_BYTES) {
+    return;
+  }
+  await cache.put(url, response);
+  return touch(url, size);
+}
+
+// move an entry to the end of the index, then evict from the start
+async function touch(url, size) {
+  const cache = await caches.open(IMAGES_CACHE);
+  const index = await readIndex(cache);
+  const position = index.findIndex((entry) => entry.url === url);
+  if (position >= 0) {
+    const [entry] = index.splice(position, 1);
+    size = size === null ? entry.size : size;
+  }
+  if (size === null) {
+    return;
+  }
+  index.push({ url, size });
+  let total = index.reduce((sum, entry) => sum + entry.size, 0);
+  while (total > MAX_IMAGE_BYTES && index.length) {
+    const evicted = index.shift();
+    total -= evicted.size;
+    await cache.delete(evicted.url);
+  }
+  await cache.put(
+    INDEX_URL,
+    new Response(JSON.stringify(index), { headers: { "Content-Type": "application/json" } })
+  );
+}
@@ -0,0 +1,103 @@
+import re
+
+# GLightbox animations by plugin effect, fade is always used by the overlay
+EFFECT_ANIMATIONS = {
+    "zoom": ("gzoomIn", "gzoomOut"),
+    "slide": ("gslideInLeft", "gslideOutLeft", "gslideInRight", "gslideOutRight"),
+}
+CAPTION_POSITIONS = ("bottom", "top", "left", "right")
+RICH_MEDIA_SELECTOR = re.compile(
+    r"gvideo|gslide-video|plyr|iframe|video|gslide-inline|ginlined-content"
+    r"|gslide-external|wait-autoplay"
+)
+IMAGE_HREF = re.compile(
+    r"\.(?:png|jpe?g|gif|webp|avif|svg|bmp|ico|tiff?)(?:[?#]|$)", re.IGNORECASE
+)
+
+
+def is_image_slide(node):
+    """Whether GLightbox opens an existing lightbox element as an image slide"""
+    if "data-glightbox" in node.attributes:
+        return False
+    slide_type = node.attributes.get("data-type")
+    if slide_type:
+        return slide_type == "image"
+    return IMAGE_HREF.search(node.attributes.get("href") or "") is not None
+
+
+def slim_css(css, effects, caption_positions, rich_media=False):
+    """Drop the rules of GLightbox css for unused effects and caption positions
+
+    Rules for video, iframe and inline slides are dropped too, unless such
+    slides are used
+    """
+    unused = [
+        name
+        for effect, names in EFFECT_ANIMATIONS.items()
+        if effect not in effects
+        for name in names
+    ]
+    patterns = [rf"\b{name}\b" for name in unused]
+    patterns += [
+        rf"\bdesc(?:ription)?-{position}\b"
+        for position in CAPTION_POSITIONS
+        if position not in caption_positions
+    ]
+    if not rich_media:
+        patterns.append(RICH_MEDIA_SELECTOR.pattern)
+    if not patterns:
+        return css
+    return _filter_rules(css, re.compile("|".join(patterns)), set(unused))
+
+
+def _filter_rules(css, unused_selector, unused_keyframes):
+    output = []
+    for prelude, body in _split_rules(css):
+        if prelude.startswith("@media"):
+            body = _filter_rules(body, unused_selector, unused_keyframes)
+            if body:
+                output.append(f"{prelude}{{{body}}}")
+        elif prelude.startswith(("@keyframes", "@-webkit-keyframes")):
+            if prelude.split()[-1] not in unused_keyframes:
+                output.append(f"{prelude}{{{body}}}")
+        else:
+            selectors = [
+                selector
+                for selector in _split_selectors(prelude)
+                if not unused_selector.search(selector)
+            ]
+            if selectors:
+                output.append(f"{','.join(selectors)}{{{body}}}")
+    return "".join(output)
+
+
+def _split_rules(css):
+    """Split css into (prelude, body) of the top level rules"""
+    depth = 0
+    start = 0
+    for index, char in enumerate(css):
+        if char == "{":
+            if depth == 0:
+                prelude_end = index
+            depth += 1
+        elif char == "}":
+            depth -= 1
+            if depth == 0:
+                yield css[start:prelude_end].strip(), css[prelude_end + 1 : index]
+                start = index + 1
+
+
+def _split_selectors(prelude):
+    selectors = []
+    depth = 0
+    start = 0
+    for index, char in enumerate(prelude):
+        if char == "(":
+            depth += 1
+        elif char == ")":
+            depth -= 1
+        elif char == "," and depth == 0:
+            selectors.append(prelude[start:index])
+            start = index + 1
+    selectors.append(prelude[start:])
+    return selectors
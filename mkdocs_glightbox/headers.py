@@ -0,0 +1,58 @@
+BLOCK_START = "# mkdocs-glightbox start"
+BLOCK_END = "# mkdocs-glightbox end"
+
+
+def read_headers(text):
+    """Parse a _headers manifest of static hosts into headers by path
+
+    Paths start a rule and are followed by indented "Name: value" lines.
+    Blank lines and comments are skipped, headers of a path repeated in the
+    manifest are joined.
+    """
+    rules = {}
+    path = None
+    for line in text.splitlines():
+        stripped = line.strip()
+        if not stripped or stripped.startswith("#"):
+            continue
+        if line[0].isspace():
+            if path is not None:
+                rules[path].append(stripped)
+        else:
+            path = stripped
+            rules.setdefault(path, [])
+    return rules
+
+
+def format_headers(rules):
+    """Format the headers by path as the block of the plugin in a manifest"""
+    return (
+        BLOCK_START
+        + "\n"
+        + "".join(
+            path + "\n" + "".join(f"  {header}\n" for header in headers)
+            for path, headers in rules.items()
+        )
+        + BLOCK_END
+        + "\n"
+    )
+
+
+def replace_block(text, block):
+    """Replace the block of the plugin in a manifest, or append it
+
+    Lines outside of the block, comments and blank lines included, are kept
+    as they are. Static hosts apply the headers of all rules matching a path.
+    """
+    lines = text.splitlines(keepends=True)
+    stripped = [line.strip() for line in lines]
+    if BLOCK_START in stripped:
+        start = stripped.index(BLOCK_START)
+        if BLOCK_END in stripped[start:]:
+            end = stripped.index(BLOCK_END, start)
+            return "".join(lines[:start]) + block + "".join(lines[end + 1 :])
+    if not text.strip():
+        return block
+    if not text.endswith("\n"):
+        text += "\n"
+    return text + "\n" + block
@@ -0,0 +1,74 @@
+import hashlib
+import os
+import struct
+
+
+def inspect_image(path):
+    """Read (size, width, height) of a local image file"""
+    return (os.path.getsize(path), *read_image_size(path))
+
+
+def hash_file(path):
+    """SHA-256 hex digest of the content of a file, to key cached derivatives"""
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def read_image_size(path):
+    """Read (width, height) from the header of a PNG, GIF, JPEG or WebP file
+
+    Only the first bytes of the file are read, the image is never decoded.
+    Return (None, None) for unknown or broken files.
+    """
+    try:
+        with open(path, "rb") as f:
+            head = f.read(32)
+            if head.startswith(b"\x89PNG\r\n\x1a\n") and head[12:16] == b"IHDR":
+                return struct.unpack(">II", head[16:24])
+            if head[:6] in (b"GIF87a", b"GIF89a"):
+                return struct.unpack("<HH", head[6:10])
+            if head[:4] == b"RIFF" and head[8:12] == b"WEBP":
+                return _read_webp_size(head)
+            if head[:2] == b"\xff\xd8":
+                f.seek(2)
+                return _read_jpeg_size(f)
+    except (OSError, struct.error):
+        pass
+    return None, None
+
+
+def _read_webp_size(head):
+    chunk = head[12:16]
+    if chunk == b"VP8 ":
+        width, height = struct.unpack("<HH", head[26:30])
+        return width & 0x3FFF, height & 0x3FFF
+    if chunk == b"VP8L":
+        bits = struct.unpack("<I", head[21:25])[0]
+        return (bits & 0x3FFF) + 1, ((bits >> 14) & 0x3FFF) + 1
+    if chunk == b"VP8X":
+        width = int.from_bytes(head[24:27], "little") + 1
+        height = int.from_bytes(head[27:30], "little") + 1
+        return width, height
+    return None, None
+
+
+def _read_jpeg_size(f):
+    # walk the segments until a start of frame marker (SOF0-SOF15 except DHT, JPG, DAC)
+    while True:
+        marker = f.read(2)
+        if len(marker) < 2 or marker[0] != 0xFF:
+            return None, None
+        code = marker[1]
+        if code == 0xFF:
+            f.seek(-1, 1)
+            continue
+        if code in (0x01, 0xD0, 0xD1, 0xD2, 0xD3, 0xD4, 0xD5, 0xD6, 0xD7):
+            continue
+        length = struct.unpack(">H", f.read(2))[0]
+        if 0xC0 <= code <= 0xCF and code not in (0xC4, 0xC8, 0xCC):
+            height, width = struct.unpack(">xHH", f.read(5))
+            return width, height
+        f.seek(length - 2, 1)
@@ -0,0 +1,72 @@
+import logging
+import os
+from concurrent.futures import Future, ThreadPoolExecutor, wait
+from threading import BoundedSemaphore
+
+log = logging.getLogger(f"mkdocs.plugins.{__name__}")
+
+
+class ImageJobs:
+    """Run the file work on local images in a thread pool while pages render
+
+    Jobs are queued by key, so the work on an image referenced by many pages
+    runs once per build. Submitting blocks while max_pending jobs wait to be
+    done, which bounds the memory held by queued jobs and their results.
+    Without a started pool, jobs run inline.
+    """
+
+    def __init__(self, workers=0, max_pending=0):
+        self.workers = workers or min(32, (os.cpu_count() or 1) + 4)
+        self.max_pending = max_pending or self.workers * 4
+        self._executor = None
+        self._slots = None
+        self._futures = {}
+
+    def start(self):
+        """Start the pool for a build"""
+        self.shutdown()
+        self._futures = {}
+        self._slots = BoundedSemaphore(self.max_pending)
+        self._executor = ThreadPoolExecutor(
+            max_workers=self.workers, thread_name_prefix="glightbox"
+        )
+
+    def submit(self, key, fn, *args):
+        """Queue fn(*args) once per key and return its future"""
+        future = self._futures.get(key)
+        if future is not None:
+            return future
+        if self._executor is None:
+            future = Future()
+            try:
+                future.set_result(fn(*args))
+            except Exception as error:
+                future.set_exception(error)
+        else:
+            self._slots.acquire()
+            try:
+                future = self._executor.submit(fn, *args)
+            except BaseException:
+                self._slots.release()
+                raise
+            future.add_done_callback(lambda _: self._slots.release())
+        self._futures[key] = future
+        return future
+
+    def join(self):
+        """Wait for all queued jobs and stop the pool, raise the first error"""
+        try:
+            wait(self._futures.values())
+            for future in self._futures.values():
+                future.result()
+        finally:
+            self.shutdown()
+
+    def shutdown(self):
+        """Stop the pool and drop the jobs which have not started yet"""
+        if self._executor is not None:
+            for future in self._futures.values():
+                future.cancel()
+            self._executor.shutdown(wait=True)
+            self._executor = None
+            log.debug(f"Image jobs stopped after {len(self._futures)} jobs")
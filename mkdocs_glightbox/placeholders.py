@@ -0,0 +1,56 @@
+import base64
+import io
+import logging
+import os
+import threading
+
+from .imaging import hash_file
+
+try:
+    from PIL import Image, features
+except ImportError:
+    Image = None
+
+log = logging.getLogger(f"mkdocs.plugins.{__name__}")
+
+
+def make_placeholder(path, cache_dir, size):
+    """Tiny thumbnail of a local image as a data URL, None if not readable
+
+    Placeholders are cached by the hash of the image file, so an unchanged
+    image is never decoded again.
+    """
+    cache_file = os.path.join(cache_dir, f"placeholder-{hash_file(path)}-{size}.txt")
+    try:
+        with open(cache_file, encoding="utf-8") as f:
+            return f.read() or None
+    except OSError:
+        pass
+
+    data_url = ""
+    try:
+        with Image.open(path) as image:
+            image.draft("RGB", (size, size))
+            image.thumbnail((size, size))
+            if image.mode not in ("RGB", "RGBA"):
+                image = image.convert("RGBA")
+            buffer = io.BytesIO()
+            if features.check("webp"):
+                image.save(buffer, "WEBP", quality=40)
+                mime = "image/webp"
+            else:
+                image.save(buffer, "PNG", optimize=True)
+                mime = "image/png"
+        data_url = f"data:{mime};base64," + base64.b64encode(buffer.getvalue()).decode(
+            "ascii"
+        )
+    except (OSError, ValueError, Image.DecompressionBombError) as error:
+        log.debug(f"No placeholder for {path}: {error}")
+
+    # an empty cache file records images without placeholder
+    os.makedirs(cache_dir, exist_ok=True)
+    temp_file = f"{cache_file}.{threading.get_ident()}.tmp"
+    with open(temp_file, "w", encoding="utf-8") as f:
+        f.write(data_url)
+    os.replace(temp_file, cache_file)
+    return data_url or None
@@ -1,20 +1,57 @@
+import csv
+import hashlib
 import json
 import logging
 import os
+import posixpath
+from contextlib import nullcontext
+from importlib.metadata import PackageNotFoundError, version
+from typing import NamedTuple, Optional
+from urllib.parse import urlsplit
 
 from mkdocs import utils
 from mkdocs.config import config_options
-from mkdocs.plugins import BasePlugin
-from selectolax.lexbor import LexborHTMLParser, create_tag
-
-log = logging.getLogger(__name__)
+from mkdocs.plugins import BasePlugin, CombinedEvent, event_priority
+from selectolax.lexbor import LexborHTMLParser, SelectolaxError, create_tag
+
+from .bundle import is_image_slide, slim_css
+from .headers import format_headers, replace_block
+from .imaging import inspect_image
+from .jobs import ImageJobs
+from .placeholders import Image, make_placeholder
+from .stats import PROFILE_ENV, BuildStats, measure_hook
+from .tiles import TILE_JOBS, copy_tiles, make_tiles
+
+log = logging.getLogger(f"mkdocs.plugins.{__name__}")
 base_path = os.path.dirname(os.path.abspath(__file__))
+CSS_ENGINE_STYLESHEET = "assets/stylesheets/glightbox-css.css"
+DEEP_ZOOM_VIEWER = "assets/glightbox/deep-zoom.html"
+DEEP_ZOOM_TILES = "assets/glightbox/tiles"
+GLIGHTBOX_ASSETS = (
+    "assets/stylesheets/glightbox.min.css",
+    "assets/javascripts/glightbox.min.js",
+)
+SERVICE_WORKER = "glightbox-sw.js"
+
+
+class ImageRecord(NamedTuple):
+    """A wrapped image, size and dimensions are only known for local files"""
+
+    page: str
+    href: str
+    gallery: str
+    size: Optional[int]
+    width: Optional[int]
+    height: Optional[int]
 
 
 class LightboxPlugin(BasePlugin):
     """Add lightbox to MkDocs"""
 
+    stats = None
+
     config_scheme = (
+        ("engine", config_options.Choice(("glightbox", "css"), default="glightbox")),
         ("touchNavigation", config_options.Type(bool, default=True)),
         ("loop", config_options.Type(bool, default=False)),
         ("effect", config_options.Choice(("zoom", "fade", "none"), default="zoom")),
@@ -36,6 +73,28 @@ class LightboxPlugin(BasePlugin):
         ("background", config_options.Type(str, default="white")),
         ("shadow", config_options.Type(bool, default=True)),
         ("manual", config_options.Type(bool, default=False)),
+        ("bundle", config_options.Choice(("auto", "full", "slim"), default="full")),
+        (
+            "privacy_href",
+            config_options.Choice(("runtime", "build"), default="runtime"),
+        ),
+        ("placeholder", config_options.Type(bool, default=False)),
+        ("placeholder_size", config_options.Type(int, default=32)),
+        ("deep_zoom", config_options.Type(int, default=0)),
+        ("inventory", config_options.Type(str, default="")),
+        ("image_size_budget", config_options.Type(int, default=0)),
+        ("page_size_budget", config_options.Type(int, default=0)),
+        (
+            "service_worker",
+            config_options.Choice((True, False, "unregister"), default=False),
+        ),
+        ("service_worker_cache_size", config_options.Type(int, default=50)),
+        ("workers", config_options.Type(int, default=0)),
+        ("cache_dir", config_options.Type(str, default=".cache/plugin/glightbox")),
+        ("headers", config_options.Type(str, default="")),
+        ("stats", config_options.Type(bool, default=False)),
+        ("stats_file", config_options.Type(str, default="")),
+        ("stats_slowest", config_options.Type(int, default=10)),
     )
 
     def on_config(self, config):
@@ -45,26 +104,76 @@ class LightboxPlugin(BasePlugin):
             and "material/privacy" in config["plugins"]
             and config["plugins"]["material/privacy"].config.enabled
         )
+        self.images = []
+        self.media_files = {}
+        self.caption_positions = set()
+        self.wrapped_pages = set()
+        self.glightbox_assets = None
+        self.jobs = ImageJobs(self.config["workers"])
+        self.tile_jobs = ImageJobs(TILE_JOBS)
+        self.cache_dir = os.path.join(
+            os.path.dirname(config.config_file_path or ""), self.config["cache_dir"]
+        )
+        self.using_placeholders = self.config["placeholder"] and Image is not None
+        if self.config["placeholder"] and Image is None:
+            log.warning(
+                "Placeholders require Pillow: pip install mkdocs-glightbox[placeholders]"
+            )
+        self.using_deep_zoom = self.config["deep_zoom"] > 0 and Image is not None
+        if self.config["deep_zoom"] > 0 and Image is None:
+            log.warning(
+                "Deep zoom requires Pillow: pip install mkdocs-glightbox[deep-zoom]"
+            )
+        self.tiles = set()
+        # tiled images open as iframe slides, which need the full stylesheet
+        self.rich_slides = self.using_deep_zoom
+        self.stats = None
+        if self.config["stats"] or os.environ.get(PROFILE_ENV):
+            self.stats = BuildStats.from_env()
+        if (
+            self.config["engine"] == "css"
+            and CSS_ENGINE_STYLESHEET not in config["extra_css"]
+        ):
+            config["extra_css"].append(CSS_ENGINE_STYLESHEET)
 
-    def on_post_page(self, output, page, config, **kwargs):
+    def on_files(self, files, config):
+        """Map media file urls to their source path to inspect local images
+
+        Start the image jobs, which run while the pages render
+        """
+        self.media_files = {file.url: file.abs_src_path for file in files.media_files()}
+        if self._tracking_images() or self.using_placeholders or self.using_deep_zoom:
+            self.jobs.start()
+        if self.using_deep_zoom:
+            self.tile_jobs.start()
+
+    @measure_hook
+    def _on_post_page(self, output, page, config, **kwargs):
         """Add css link tag, javascript script tag, and javascript code to initialize GLightbox"""
         # skip page with meta glightbox is false
         if "glightbox" in page.meta and page.meta.get("glightbox", True) is False:
             return output
+        # css engine needs no javascript, its stylesheet is added by extra_css
+        if self.config["engine"] == "css":
+            return output
 
         tree = LexborHTMLParser(output)
         head_node = tree.css_first("head")
         body_node = tree.css_first("body")
+        if self.using_placeholders:
+            self._set_placeholders(tree, page)
+        if self.using_deep_zoom:
+            self._set_deep_zoom(tree, page)
 
         glightbox_css_node = create_tag("link")
         glightbox_css_node.attrs["href"] = utils.get_relative_url(
-            utils.normalize_url("assets/stylesheets/glightbox.min.css"), page.url
+            utils.normalize_url(self._get_asset_url(GLIGHTBOX_ASSETS[0])), page.url
         )
         glightbox_css_node.attrs["rel"] = "stylesheet"
 
         glightbox_js_node = create_tag("script")
         glightbox_js_node.attrs["src"] = utils.get_relative_url(
-            utils.normalize_url("assets/javascripts/glightbox.min.js"), page.url
+            utils.normalize_url(self._get_asset_url(GLIGHTBOX_ASSETS[1])), page.url
         )
         head_node.insert_child(glightbox_css_node)
         head_node.insert_child(glightbox_js_node)
@@ -81,6 +190,9 @@ class LightboxPlugin(BasePlugin):
         if not self.config["shadow"]:
             css_text += """
             .glightbox-clean .gslide-media { -webkit-box-shadow: none; box-shadow: none; }"""
+        if self.using_placeholders:
+            css_text += """
+            .glightbox-placeholder { position: fixed; z-index: 1; top: 5vh; left: 5vw; width: 90vw; height: 90vh; object-fit: contain; filter: blur(8px); pointer-events: none; }"""
         if config["theme"].name == "material":
             css_text += """
             .gscrollbar-fixer { padding-right: 15px; }
@@ -103,7 +215,7 @@ class LightboxPlugin(BasePlugin):
         lb["closeEffect"] = plugin_config.get("effect", "zoom")
         lb["slideEffect"] = plugin_config.get("slide_effect", "slide")
         js_code = ""
-        if self.using_material_privacy:
+        if self.using_material_privacy and self.config["privacy_href"] == "runtime":
             js_code += """document.querySelectorAll('.glightbox').forEach(function(element) {
     try {
         var img = element.querySelector('img');
@@ -123,6 +235,47 @@ class LightboxPlugin(BasePlugin):
 });
 """
         js_code += "const lightbox = GLightbox(" + json.dumps(lb) + ");\n"
+        if self.using_placeholders:
+            js_code += """lightbox.on('slide_before_load', function(data) {
+    var placeholder = data.trigger && data.trigger.dataset.placeholder;
+    if (!placeholder || data.slideIndex !== lightbox.index) {
+        return;
+    }
+    var img = document.createElement('img');
+    img.className = 'glightbox-placeholder';
+    img.alt = '';
+    img.src = placeholder;
+    lightbox.modal.appendChild(img);
+    data.slideNode.glightboxPlaceholder = img;
+});
+lightbox.on('slide_after_load', function(data) {
+    if (data.slideNode.glightboxPlaceholder) {
+        data.slideNode.glightboxPlaceholder.remove();
+        delete data.slideNode.glightboxPlaceholder;
+    }
+});
+"""
+        if self.config["service_worker"] is True:
+            service_worker_url = utils.get_relative_url(
+                utils.normalize_url(SERVICE_WORKER), page.url
+            )
+            js_code += (
+                """if ('serviceWorker' in navigator) {
+    navigator.serviceWorker.register('"""
+                + service_worker_url
+                + """');
+    lightbox.on('slide_after_load', function(data) {
+        var worker = navigator.serviceWorker.controller;
+        if (worker && data.slideConfig.type === 'image' && data.slideConfig.href) {
+            worker.postMessage({
+                type: 'glightbox-cache',
+                url: new URL(data.slideConfig.href, location.href).href,
+            });
+        }
+    });
+}
+"""
+            )
         if self.using_material or "navigation.instant" in config["theme"].get(
             "features", []
         ):
@@ -135,6 +288,32 @@ class LightboxPlugin(BasePlugin):
 
         return tree.html
 
+    @event_priority(-100)
+    @measure_hook
+    def _on_post_page_privacy_href(self, output, page, config, **kwargs):
+        """Set anchor href from the image url localized by the privacy plugin
+
+        Run after the privacy plugin has replaced the external image urls, so
+        the lightbox targets are known without running javascript on the page
+        """
+        if not (self.using_material_privacy and self.config["privacy_href"] == "build"):
+            return output
+        if "glightbox" in page.meta and page.meta.get("glightbox", True) is False:
+            return output
+
+        tree = LexborHTMLParser(output)
+        for a_node in tree.css("a.glightbox:not([href])"):
+            img = a_node.css_first("img")
+            if img is None:
+                continue
+            src = img.attributes.get("data-src") or img.attributes.get("src")
+            if src:
+                a_node.attrs["href"] = src
+        return tree.html
+
+    on_post_page = CombinedEvent(_on_post_page, _on_post_page_privacy_href)
+
+    @measure_hook
     def on_page_content(self, html, page, config, **kwargs):
         """Wrap img tag with anchor tag with glightbox class and attributes from config"""
         # skip page with meta glightbox is false
@@ -145,19 +324,54 @@ class LightboxPlugin(BasePlugin):
             "skip_classes"
         ]
         return self.wrap_img_with_anchor_selectolax(
-            html, plugin_config=self.config, meta=page.meta, skip_classes=skip_classes
+            html,
+            plugin_config=self.config,
+            meta=page.meta,
+            skip_classes=skip_classes,
+            page=page,
         )
 
     def wrap_img_with_anchor_selectolax(
-        self, html: str, plugin_config, meta, skip_classes
+        self, html: str, plugin_config, meta, skip_classes, page=None
     ):
-        tree = LexborHTMLParser(html)
+        stats = self.stats
+        css_engine = plugin_config.get("engine") == "css"
+        slides = []
+        wrapped = 0
+        with self._step("parse"):
+            tree = LexborHTMLParser(html)
+
+        if not css_engine and plugin_config.get("bundle") != "full":
+            self._detect_slides(tree)
 
         for img in tree.css("img"):
-            if self._should_skip_img(img, skip_classes, plugin_config, meta):
+            skip_reason = self._should_skip_img(img, skip_classes, plugin_config, meta)
+            if stats is not None:
+                stats.images["seen"] += 1
+                if skip_reason:
+                    stats.skipped[skip_reason] += 1
+            if skip_reason:
                 continue
 
             attrs = self._build_anchor_attrs(img, plugin_config, meta)
+            # the css engine shows neither placeholders nor tiles
+            if page is not None and not css_engine and self.using_placeholders:
+                self._get_placeholder_job(self._get_image_href(img, attrs), page)
+            if page is not None and not css_engine and self.using_deep_zoom:
+                self._get_tiles_job(self._get_image_href(img, attrs), page)
+            self.caption_positions.add(attrs.get("data-desc-position", "bottom"))
+            if page is not None and self._tracking_images():
+                self.images.append(self._build_image_record(img, attrs, page))
+            if css_engine:
+                slides.append(
+                    (
+                        self._get_image_href(img, attrs),
+                        img.attributes.get("alt") or "",
+                        attrs.copy(),
+                    )
+                )
+                attrs["href"] = f"#glb-{len(slides) - 1}"
+                attrs["id"] = f"glb-img-{len(slides) - 1}"
 
             a_node = create_tag("a")
             for key, value in attrs.items():
@@ -167,21 +381,240 @@ class LightboxPlugin(BasePlugin):
             a_node.insert_child(img_clone)
             img.replace_with(a_node)
 
-        return tree.html
+            wrapped += 1
+            if stats is not None:
+                stats.images["wrapped"] += 1
+
+        if wrapped and page is not None:
+            self.wrapped_pages.add(page.url)
+        if slides:
+            tree.body.insert_child(
+                self._build_css_overlays(tree, slides, plugin_config)
+            )
+
+        with self._step("serialize"):
+            output = tree.html
+        return output
+
+    def _detect_slides(self, tree):
+        """Collect the slide features of lightbox elements already in the page"""
+        for node in tree.css(".glightbox"):
+            if not is_image_slide(node):
+                self.rich_slides = True
+            self.caption_positions.add(
+                node.attributes.get("data-desc-position") or "bottom"
+            )
+
+    def _build_css_overlays(self, tree, slides, plugin_config):
+        """Build an overlay per image for the css engine, shown by :target
+
+        Overlays of the same gallery are linked with previous and next links.
+        A description starting with a dot selects the element of the page
+        whose content is the description, as in GLightbox.
+        """
+        galleries = {}
+        for index, (_, _, attrs) in enumerate(slides):
+            galleries.setdefault(attrs.get("data-gallery", ""), []).append(index)
+        neighbours = {}
+        for indexes in galleries.values():
+            for pos, index in enumerate(indexes):
+                prev_index = indexes[pos - 1] if pos > 0 else None
+                next_index = indexes[pos + 1] if pos + 1 < len(indexes) else None
+                if plugin_config.get("loop") and len(indexes) > 1:
+                    prev_index = indexes[pos - 1]
+                    next_index = indexes[(pos + 1) % len(indexes)]
+                neighbours[index] = (prev_index, next_index)
+
+        container = create_tag("div")
+        container.attrs["class"] = "glightbox-css"
+        for index, (href, alt, attrs) in enumerate(slides):
+            overlay = create_tag("div")
+            overlay.attrs["id"] = f"glb-{index}"
+            overlay.attrs["class"] = (
+                f"glb-overlay glb-desc-{attrs.get('data-desc-position', 'bottom')}"
+            )
+            overlay.attrs["role"] = "dialog"
+            overlay.attrs["aria-label"] = attrs.get("data-title") or alt
+
+            close = create_tag("a")
+            close.attrs["class"] = "glb-close"
+            close.attrs["href"] = f"#glb-img-{index}"
+            close.attrs["aria-label"] = "Close"
+            overlay.insert_child(close)
+
+            figure = create_tag("figure")
+            img = create_tag("img")
+            img.attrs["src"] = href
+            img.attrs["alt"] = alt
+            img.attrs["loading"] = "lazy"
+            figure.insert_child(img)
+            title = attrs.get("data-title")
+            description = attrs.get("data-description")
+            if title or description:
+                figcaption = create_tag("figcaption")
+                if title:
+                    title_node = create_tag("strong")
+                    title_node.attrs["class"] = "glb-title"
+                    title_node.insert_child(title)
+                    figcaption.insert_child(title_node)
+                if description:
+                    self._insert_description(tree, figcaption, description)
+                figure.insert_child(figcaption)
+            overlay.insert_child(figure)
+
+            for name, label, target in zip(
+                ("glb-prev", "glb-next"), ("Previous", "Next"), neighbours[index]
+            ):
+                if target is not None:
+                    link = create_tag("a")
+                    link.attrs["class"] = name
+                    link.attrs["href"] = f"#glb-{target}"
+                    link.attrs["aria-label"] = label
+                    overlay.insert_child(link)
+            container.insert_child(overlay)
+        return container
+
+    def _insert_description(self, tree, figcaption, description):
+        """Insert a description text or a copy of the element it selects"""
+        node = None
+        if description.startswith("."):
+            try:
+                node = tree.css_first(description)
+            except SelectolaxError:
+                log.warning(f"Invalid description selector: {description}")
+        if node is None:
+            figcaption.insert_child(description)
+            return
+        description_node = create_tag("div")
+        description_node.attrs["class"] = "glb-description"
+        for child in node.iter(include_text=True):
+            description_node.insert_child(child)
+        figcaption.insert_child(description_node)
+
+    def _step(self, name):
+        """Time a step of the hot path when stats are enabled"""
+        return self.stats.step(name) if self.stats is not None else nullcontext()
+
+    def _tracking_images(self):
+        return bool(
+            self.config["inventory"]
+            or self.config["image_size_budget"]
+            or self.config["page_size_budget"]
+        )
+
+    def _build_image_record(self, img, attrs, page):
+        """Collect href and gallery of a wrapped image
+
+        Return the record with a job reading the file size and dimensions of
+        a local image, which are set by _resolve_image_records
+        """
+        href = self._get_image_href(img, attrs)
+        record = ImageRecord(
+            page.url, href, attrs.get("data-gallery", ""), None, None, None
+        )
+        path = self._get_local_image_path(href, page)
+        if path is None:
+            return record, None
+        return record, self.jobs.submit(("inspect", path), inspect_image, path)
+
+    def _resolve_image_records(self):
+        """Fill in the records with the results of the finished image jobs"""
+        images = []
+        for record, job in self.images:
+            if job is not None:
+                size, width, height = job.result()
+                record = record._replace(size=size, width=width, height=height)
+            images.append(record)
+        self.images = images
+
+    def _get_placeholder_job(self, href, page):
+        """Queue making the placeholder of a local image, None for other images"""
+        path = self._get_local_image_path(href, page)
+        if path is None:
+            return None
+        return self.jobs.submit(
+            ("placeholder", path),
+            make_placeholder,
+            path,
+            self.cache_dir,
+            self.config["placeholder_size"],
+        )
+
+    def _set_placeholders(self, tree, page):
+        """Set the placeholders made while the pages rendered on the anchors"""
+        for a_node in tree.css("a.glightbox"):
+            img = a_node.css_first("img")
+            if img is None:
+                continue
+            job = self._get_placeholder_job(
+                self._get_image_href(img, a_node.attributes), page
+            )
+            placeholder = job.result() if job is not None else None
+            if placeholder:
+                a_node.attrs["data-placeholder"] = placeholder
+
+    def _get_tiles_job(self, href, page):
+        """Queue tiling a large local image, None for other images"""
+        path = self._get_local_image_path(href, page)
+        if path is None:
+            return None
+        return self.tile_jobs.submit(
+            ("tiles", path), make_tiles, path, self.cache_dir, self.config["deep_zoom"]
+        )
+
+    def _set_deep_zoom(self, tree, page):
+        """Open tiled images in the deep zoom viewer, as an external slide"""
+        viewer = utils.get_relative_url(utils.normalize_url(DEEP_ZOOM_VIEWER), page.url)
+        for a_node in tree.css("a.glightbox"):
+            img = a_node.css_first("img")
+            if img is None:
+                continue
+            job = self._get_tiles_job(
+                self._get_image_href(img, a_node.attributes), page
+            )
+            name = job.result() if job is not None else None
+            if name is None:
+                continue
+            a_node.attrs["href"] = f"{viewer}?dzi=tiles/{name}/image.dzi"
+            a_node.attrs["data-type"] = "external"
+            a_node.attrs["data-width"] = "100vw"
+            a_node.attrs["data-height"] = "100vh"
+            self.tiles.add(name)
+
+    def _get_image_href(self, img, attrs):
+        """Lightbox target of an image, also when the anchor has no href"""
+        return (
+            attrs.get("href")
+            or img.attributes.get("data-src")
+            or img.attributes.get("src", "")
+        )
+
+    def _get_local_image_path(self, src, page):
+        """Resolve an image url relative to the page to the path of a media file"""
+        url = urlsplit(src)
+        if url.scheme or url.netloc or not url.path:
+            return None
+        path = posixpath.normpath(
+            posixpath.join(posixpath.dirname("/" + page.url), url.path)
+        ).lstrip("/")
+        return self.media_files.get(path)
 
     def _should_skip_img(self, img, skip_classes, plugin_config, meta):
-        """Skip by class, page meta, or plugin config"""
+        """Skip by class, page meta, or plugin config
+
+        Return the reason to skip the image, which is falsy to keep it
+        """
         if img.parent and img.parent.tag == "a":
-            return True
+            return "anchor"
         classes = img.attributes.get("class", "").split()
         if set(classes) & set(skip_classes):
-            return True
+            return "class"
         if plugin_config.get("manual") and meta.get("glightbox", None) is True:
             return False
         elif (
             meta.get("glightbox-manual", False) or plugin_config.get("manual")
         ) and "on-glb" not in classes:
-            return True
+            return "manual"
 
     def _build_anchor_attrs(self, img, plugin_config, meta):
         """Get attributes from img for the anchor tag"""
@@ -245,15 +678,244 @@ class LightboxPlugin(BasePlugin):
 
     def on_post_build(self, config, **kwargs):
         """Copy glightbox"s css and js files to assets directory"""
+        self._on_post_build(config)
+        if self.stats is not None:
+            self._report_stats(config)
+
+    @measure_hook
+    def _on_post_build(self, config):
+        self.tile_jobs.join()
+        if self.tiles:
+            utils.copy_file(
+                os.path.join(base_path, "assets", "deep-zoom.html"),
+                os.path.join(config["site_dir"], DEEP_ZOOM_VIEWER),
+            )
+            for name in self.tiles:
+                self.jobs.submit(
+                    ("copy-tiles", name),
+                    copy_tiles,
+                    self.cache_dir,
+                    name,
+                    os.path.join(config["site_dir"], DEEP_ZOOM_TILES),
+                )
+        self.jobs.join()
+        self._resolve_image_records()
+
+        if self.config["engine"] == "css":
+            utils.write_file(
+                self._build_css_engine_stylesheet(config).encode("utf-8"),
+                os.path.join(config["site_dir"], CSS_ENGINE_STYLESHEET),
+            )
+        else:
+            for path, content in self._get_glightbox_assets().items():
+                utils.write_file(content, os.path.join(config["site_dir"], path))
+        if self.config["service_worker"] is True and self.config["engine"] != "css":
+            utils.write_file(
+                self._build_service_worker(config).encode("utf-8"),
+                os.path.join(config["site_dir"], SERVICE_WORKER),
+            )
+        elif self.config["service_worker"] == "unregister":
+            # a worker registered by an earlier build removes itself
+            utils.copy_file(
+                os.path.join(base_path, "assets", "glightbox-sw-unregister.js"),
+                os.path.join(config["site_dir"], SERVICE_WORKER),
+            )
+
+        if self.config["inventory"]:
+            self._write_inventory(
+                os.path.join(config["site_dir"], self.config["inventory"])
+            )
+        if self.config["headers"]:
+            self._write_headers(
+                config, os.path.join(config["site_dir"], self.config["headers"])
+            )
+        self._check_image_budgets()
+
+    def on_build_error(self, error, **kwargs):
+        """Stop the image jobs of the failed build"""
+        self.jobs.shutdown()
+        self.tile_jobs.shutdown()
+
+    def _get_glightbox_assets(self):
+        """Content of the GLightbox assets by path in the site
+
+        Built once per build, at the first page written after the content of
+        all pages is known
+        """
+        if self.glightbox_assets is None:
+            if self._use_slim_bundle():
+                stylesheet = self._build_slim_stylesheet().encode("utf-8")
+            else:
+                with open(
+                    os.path.join(base_path, "glightbox", "glightbox.min.css"), "rb"
+                ) as f:
+                    stylesheet = f.read()
+            with open(
+                os.path.join(base_path, "glightbox", "glightbox.min.js"), "rb"
+            ) as f:
+                script = f.read()
+            self.glightbox_assets = dict(zip(GLIGHTBOX_ASSETS, (stylesheet, script)))
+        return self.glightbox_assets
+
+    def _get_asset_url(self, path):
+        """Url of a GLightbox asset, versioned by its content with headers"""
+        if not self.config["headers"]:
+            return path
+        digest = hashlib.sha256(self._get_glightbox_assets()[path]).hexdigest()
+        return f"{path}?v={digest[:12]}"
+
+    def _write_headers(self, config, path):
+        """Write the headers manifest of static hosts, or add to an existing one
+
+        GLightbox assets are versioned by their content and the tiles are
+        stored by the hash of the image, so both are cached as immutable.
+        Pages with wrapped images preload the assets.
+        """
+        base = urlsplit(config["site_url"] or "").path.rstrip("/")
+        immutable = "Cache-Control: public, max-age=31536000, immutable"
+        rules = {}
+        if self.config["engine"] == "css":
+            preload = [f"<{base}/{CSS_ENGINE_STYLESHEET}>; rel=preload; as=style"]
+        else:
+            for asset in GLIGHTBOX_ASSETS:
+                rules[f"{base}/{asset}"] = [immutable]
+            preload = [
+                f"<{base}/{self._get_asset_url(GLIGHTBOX_ASSETS[0])}>; rel=preload; as=style",
+                f"<{base}/{self._get_asset_url(GLIGHTBOX_ASSETS[1])}>; rel=preload; as=script",
+            ]
+        if self.tiles:
+            rules[f"{base}/{DEEP_ZOOM_TILES}/*"] = [immutable]
+        for url in sorted(self.wrapped_pages):
+            rules[f"{base}/{url}"] = ["Link: " + ", ".join(preload)]
+
+        existing = ""
+        if os.path.exists(path):
+            with open(path, encoding="utf-8") as f:
+                existing = f.read()
+        utils.write_file(
+            replace_block(existing, format_headers(rules)).encode("utf-8"), path
+        )
+        log.info(f"Headers of {len(rules)} paths written to {path}")
+
+    def _use_slim_bundle(self):
+        """Slim bundle when forced, or with auto when only images are shown"""
+        if self.config["bundle"] == "auto":
+            return not self.rich_slides
+        return self.config["bundle"] == "slim"
+
+    def _build_slim_stylesheet(self):
+        """GLightbox stylesheet without the rules of unused features"""
+        with open(
+            os.path.join(base_path, "glightbox", "glightbox.min.css"), encoding="utf-8"
+        ) as f:
+            css = f.read()
+        return slim_css(
+            css,
+            effects={self.config["effect"], self.config["slide_effect"]},
+            caption_positions=self.caption_positions,
+            rich_media=self.rich_slides,
+        )
 
-        output_base_path = os.path.join(config["site_dir"], "assets")
-        css_path = os.path.join(output_base_path, "stylesheets")
-        utils.copy_file(
-            os.path.join(base_path, "glightbox", "glightbox.min.css"),
-            os.path.join(css_path, "glightbox.min.css"),
+    def _build_service_worker(self, config):
+        """Service worker precaching the assets of the site, versioned by them
+
+        Assets are precached by the url the pages link, which carries the
+        version query when the headers manifest marks them as immutable.
+        """
+        paths = list(GLIGHTBOX_ASSETS)
+        if self.tiles:
+            paths.append(DEEP_ZOOM_VIEWER)
+        digest = hashlib.sha256()
+        for path in paths:
+            with open(os.path.join(config["site_dir"], path), "rb") as f:
+                digest.update(f.read())
+        precache = [self._get_asset_url(path) for path in GLIGHTBOX_ASSETS]
+        precache.extend(paths[len(GLIGHTBOX_ASSETS) :])
+        try:
+            plugin_version = version("mkdocs-glightbox")
+        except PackageNotFoundError:
+            plugin_version = "0"
+        with open(
+            os.path.join(base_path, "assets", SERVICE_WORKER), encoding="utf-8"
+        ) as f:
+            service_worker = f.read()
+        return (
+            service_worker.replace(
+                "__VERSION__", f"{plugin_version}-{digest.hexdigest()[:12]}"
+            )
+            .replace("__PRECACHE__", json.dumps(precache))
+            .replace(
+                "__MAX_IMAGE_BYTES__",
+                str(self.config["service_worker_cache_size"] * 1024 * 1024),
+            )
         )
-        js_path = os.path.join(output_base_path, "javascripts")
-        utils.copy_file(
-            os.path.join(base_path, "glightbox", "glightbox.min.js"),
-            os.path.join(js_path, "glightbox.min.js"),
+
+    def _build_css_engine_stylesheet(self, config):
+        """Shared stylesheet of the css engine with the options of the plugin"""
+        with open(
+            os.path.join(base_path, "assets", "glightbox-css.css"), encoding="utf-8"
+        ) as f:
+            css_text = f.read()
+        css_text += (
+            ".glightbox-css figure img { background: "
+            + self.config["background"]
+            + "; }\n"
         )
+        if self.config["shadow"]:
+            css_text += ".glightbox-css figure { box-shadow: 1px 2px 9px 0px rgba(0, 0, 0, 0.65); }\n"
+        if self.config["effect"] == "fade":
+            css_text += ".glightbox-css .glb-overlay:target { animation: glb-fade 0.3s ease; }\n"
+        elif self.config["effect"] == "zoom":
+            css_text += ".glightbox-css .glb-overlay:target figure { animation: glb-zoom 0.5s ease; }\n"
+        if config["theme"].name == "material":
+            css_text += """.glightbox-css figcaption { font-size: 0.75rem; }
+body[data-md-color-scheme="slate"] .glightbox-css figcaption { background: var(--md-default-bg-color); color: var(--md-default-fg-color); }
+body[data-md-color-scheme="slate"] .glightbox-css .glb-title { color: var(--md-default-fg-color); }
+"""
+        return css_text
+
+    def _write_inventory(self, path):
+        """Write wrapped images as JSON, or CSV when the path ends with .csv"""
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        with open(path, "w", encoding="utf-8", newline="") as f:
+            if path.endswith(".csv"):
+                writer = csv.writer(f)
+                writer.writerow(ImageRecord._fields)
+                writer.writerows(self.images)
+            else:
+                json.dump([record._asdict() for record in self.images], f, indent=2)
+        log.info(f"Image inventory with {len(self.images)} images written to {path}")
+
+    def _check_image_budgets(self):
+        """Warn about images and pages over budget, fail the build with --strict"""
+        image_budget = self.config["image_size_budget"] * 1024
+        page_budget = self.config["page_size_budget"] * 1024
+        page_sizes = {}
+        for record in self.images:
+            if record.size is None:
+                continue
+            page_sizes[record.page] = page_sizes.get(record.page, 0) + record.size
+            if image_budget and record.size > image_budget:
+                log.warning(
+                    f"Image '{record.href}' on page '{record.page}' is {record.size // 1024} KB, "
+                    f"over the image_size_budget of {self.config['image_size_budget']} KB"
+                )
+        if page_budget:
+            for page_url, size in page_sizes.items():
+                if size > page_budget:
+                    log.warning(
+                        f"Images on page '{page_url}' are {size // 1024} KB in total, "
+                        f"over the page_size_budget of {self.config['page_size_budget']} KB"
+                    )
+
+    def _report_stats(self, config):
+        """Log the build stats and profiles, and export them when stats_file is set"""
+        slowest = self.config["stats_slowest"]
+        log.info(self.stats.summary(slowest))
+        if self.config["stats_file"]:
+            path = os.path.join(config["site_dir"], self.config["stats_file"])
+            self.stats.write(path, slowest)
+            if self.stats.profiler is not None:
+                self.stats.profiler.dump_stats(os.path.splitext(path)[0] + ".prof")
+        for report in self.stats.profile_summary():
+            log.info(report)
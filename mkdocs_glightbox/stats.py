@@ -0,0 +1,151 @@
+import cProfile
+import functools
+import io
+import json
+import os
+import pstats
+import time
+import tracemalloc
+from collections import Counter, defaultdict
+from contextlib import contextmanager
+
+PROFILE_ENV = "GLIGHTBOX_PROFILE"
+
+
+def measure_hook(method):
+    """Measure a plugin hook when stats are enabled on the plugin
+
+    Record wall and CPU time per call, and HTML bytes added when the hook
+    receives and returns a page.
+    """
+
+    @functools.wraps(method)
+    def wrapper(plugin, *args, **kwargs):
+        stats = plugin.stats
+        if stats is None:
+            return method(plugin, *args, **kwargs)
+        page = kwargs.get("page")
+        with stats.measure(method.__name__.lstrip("_"), page):
+            result = method(plugin, *args, **kwargs)
+        if page is not None and isinstance(result, str):
+            added = len(result.encode("utf-8")) - len(args[0].encode("utf-8"))
+            stats.html_bytes[page.url] += added
+        return result
+
+    return wrapper
+
+
+class BuildStats:
+    """Timings and counters of the plugin collected during a build"""
+
+    def __init__(self, profile=""):
+        self.hooks = defaultdict(lambda: {"calls": 0, "wall": 0.0, "cpu": 0.0})
+        self.steps = defaultdict(float)
+        self.pages = defaultdict(float)
+        self.html_bytes = defaultdict(int)
+        self.images = Counter()
+        self.skipped = Counter()
+
+        modes = {mode.strip() for mode in profile.lower().split(",") if mode.strip()}
+        self.profiler = cProfile.Profile() if "cprofile" in modes else None
+        self.tracemalloc = "tracemalloc" in modes
+        if self.tracemalloc and not tracemalloc.is_tracing():
+            tracemalloc.start()
+
+    @classmethod
+    def from_env(cls):
+        return cls(os.environ.get(PROFILE_ENV, ""))
+
+    @contextmanager
+    def measure(self, hook, page=None):
+        wall, cpu = time.perf_counter(), time.process_time()
+        if self.profiler is not None:
+            self.profiler.enable()
+        try:
+            yield
+        finally:
+            if self.profiler is not None:
+                self.profiler.disable()
+            wall = time.perf_counter() - wall
+            cpu = time.process_time() - cpu
+            entry = self.hooks[hook]
+            entry["calls"] += 1
+            entry["wall"] += wall
+            entry["cpu"] += cpu
+            if page is not None:
+                self.pages[page.url] += wall
+
+    @contextmanager
+    def step(self, name):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.steps[name] += time.perf_counter() - start
+
+    def to_dict(self, slowest=10):
+        pages = sorted(self.pages.items(), key=lambda item: item[1], reverse=True)
+        return {
+            "hooks": dict(self.hooks),
+            "steps": dict(self.steps),
+            "images": {
+                "seen": self.images["seen"],
+                "wrapped": self.images["wrapped"],
+                "skipped": dict(self.skipped),
+            },
+            "html_bytes_added": sum(self.html_bytes.values()),
+            "slowest_pages": [
+                {"page": url, "wall": wall, "html_bytes_added": self.html_bytes[url]}
+                for url, wall in pages[:slowest]
+            ],
+        }
+
+    def write(self, path, slowest=10):
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(self.to_dict(slowest), f, indent=2)
+
+    def summary(self, slowest=10):
+        """Human readable summary of the build"""
+        data = self.to_dict(slowest)
+        lines = ["GLightbox build stats:"]
+        for hook, entry in data["hooks"].items():
+            lines.append(
+                f"  {hook}: {entry['calls']} calls, "
+                f"{entry['wall']:.3f}s wall, {entry['cpu']:.3f}s cpu"
+            )
+        for name, seconds in data["steps"].items():
+            lines.append(f"  {name}: {seconds:.3f}s")
+        images = data["images"]
+        skipped = ", ".join(f"{k}: {v}" for k, v in sorted(images["skipped"].items()))
+        lines.append(
+            f"  images: {images['seen']} seen, {images['wrapped']} wrapped, "
+            f"{sum(images['skipped'].values())} skipped"
+            + (f" ({skipped})" if skipped else "")
+        )
+        lines.append(
+            f"  html: {data['html_bytes_added']} bytes added on {len(self.html_bytes)} pages"
+        )
+        if data["slowest_pages"]:
+            lines.append(f"  slowest {len(data['slowest_pages'])} pages:")
+            for page in data["slowest_pages"]:
+                lines.append(f"    {page['wall'] * 1000:8.2f}ms  {page['page'] or '/'}")
+        return "\n".join(lines)
+
+    def profile_summary(self, limit=20):
+        """Report of the cProfile and tracemalloc captures, if enabled"""
+        reports = []
+        if self.profiler is not None:
+            stream = io.StringIO()
+            pstats.Stats(self.profiler, stream=stream).sort_stats(
+                "cumulative"
+            ).print_stats(limit)
+            reports.append(stream.getvalue())
+        if self.tracemalloc and tracemalloc.is_tracing():
+            current, peak = tracemalloc.get_traced_memory()
+            lines = [f"tracemalloc: {current} bytes current, {peak} bytes peak"]
+            for stat in tracemalloc.take_snapshot().statistics("lineno")[:limit]:
+                lines.append(f"  {stat}")
+            tracemalloc.stop()
+            reports.append("\n".join(lines))
+        return reports
@@ -0,0 +1,132 @@
+import logging
+import math
+import os
+import shutil
+import threading
+import warnings
+
+from .imaging import hash_file, read_image_size
+from .placeholders import Image
+
+log = logging.getLogger(f"mkdocs.plugins.{__name__}")
+
+TILE_SIZE = 256
+DZI_TEMPLATE = """<?xml version="1.0" encoding="UTF-8"?>
+<Image xmlns="http://schemas.microsoft.com/deepzoom/2008" TileSize="{tile_size}" Overlap="0" Format="{format}">
+  <Size Width="{width}" Height="{height}"/>
+</Image>
+"""
+
+# each tiling job holds a decoded image, which is large by definition
+TILE_JOBS = 2
+# warning filters are global, images are opened one at a time
+_open_lock = threading.Lock()
+
+
+def make_tiles(path, cache_dir, min_size):
+    """Tile a local image into a Deep Zoom (DZI) pyramid in cache_dir
+
+    Only images with a side of at least min_size pixels are tiled. Pyramids
+    are stored by the hash of the image file, so an unchanged image is never
+    tiled again. Return the name of the pyramid, None for untiled images.
+    """
+    width, height = _read_size(path)
+    if width is None or max(width, height) < min_size:
+        return None
+    # Pillow refuses images over twice its decompression bomb limit
+    limit = Image.MAX_IMAGE_PIXELS
+    if limit and width * height > 2 * limit:
+        log.warning(
+            f"Deep zoom tiles of {path} not generated: {width}x{height} pixels "
+            f"is over the limit of Pillow, Image.MAX_IMAGE_PIXELS * 2"
+        )
+        return None
+    name = hash_file(path)
+    target = os.path.join(cache_dir, "tiles", name)
+    if os.path.exists(os.path.join(target, "image.dzi")):
+        return name
+
+    temp_dir = f"{target}.{threading.get_ident()}.tmp"
+    shutil.rmtree(temp_dir, ignore_errors=True)
+    try:
+        # images over the limit are expected here, the size is checked above
+        with _open_lock, warnings.catch_warnings():
+            warnings.simplefilter("ignore", Image.DecompressionBombWarning)
+            image = Image.open(path)
+        with image:
+            image_format = _write_pyramid(image, temp_dir)
+    except (OSError, ValueError) as error:
+        log.warning(f"Deep zoom tiles of {path} not generated: {error}")
+        shutil.rmtree(temp_dir, ignore_errors=True)
+        return None
+
+    # the descriptor is written last, it marks a complete pyramid
+    with open(os.path.join(temp_dir, "image.dzi"), "w", encoding="utf-8") as f:
+        f.write(
+            DZI_TEMPLATE.format(
+                tile_size=TILE_SIZE, format=image_format, width=width, height=height
+            )
+        )
+    try:
+        os.replace(temp_dir, target)
+    except OSError:
+        # the same image is referenced by another path and was tiled already
+        shutil.rmtree(temp_dir, ignore_errors=True)
+    return name
+
+
+def _read_size(path):
+    """Read the size from the header, with Pillow for formats like TIFF or BMP"""
+    width, height = read_image_size(path)
+    if width is not None:
+        return width, height
+    try:
+        with _open_lock, warnings.catch_warnings():
+            warnings.simplefilter("ignore", Image.DecompressionBombWarning)
+            with Image.open(path) as image:
+                return image.size
+    except Image.DecompressionBombError as error:
+        log.warning(f"Deep zoom tiles of {path} not generated: {error}")
+    except (OSError, ValueError):
+        log.debug(f"Deep zoom tiles of {path} not generated: unknown image format")
+    return None, None
+
+
+def _write_pyramid(image, output_dir):
+    """Write the tiles of all levels, from full size down to 1x1 pixel"""
+    transparent = image.mode in ("RGBA", "LA", "PA") or (
+        image.mode == "P" and "transparency" in image.info
+    )
+    image = image.convert("RGBA" if transparent else "RGB")
+    image_format = "png" if transparent else "jpg"
+    level = math.ceil(math.log2(max(image.size)))
+    while level >= 0:
+        level_dir = os.path.join(output_dir, "image_files", str(level))
+        os.makedirs(level_dir)
+        width, height = image.size
+        for col in range(math.ceil(width / TILE_SIZE)):
+            for row in range(math.ceil(height / TILE_SIZE)):
+                box = (
+                    col * TILE_SIZE,
+                    row * TILE_SIZE,
+                    min((col + 1) * TILE_SIZE, width),
+                    min((row + 1) * TILE_SIZE, height),
+                )
+                tile_path = os.path.join(level_dir, f"{col}_{row}.{image_format}")
+                if transparent:
+                    image.crop(box).save(tile_path, "PNG")
+                else:
+                    image.crop(box).save(tile_path, "JPEG", quality=85)
+        if level:
+            image = image.reduce(2)
+        level -= 1
+    return image_format
+
+
+def copy_tiles(cache_dir, name, tiles_dir):
+    """Copy a pyramid from the cache to the tiles directory of the site"""
+    shutil.copytree(
+        os.path.join(cache_dir, "tiles", name),
+        os.path.join(tiles_dir, name),
+        dirs_exist_ok=True,
+    )
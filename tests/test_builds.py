@@ -1,8 +1,10 @@
 # standard lib
+import json
 import logging
 import os
 import re
 import shutil
+import time
 
 # other 3rd party
 import pytest
@@ -12,6 +14,11 @@ from click.testing import CliRunner
 from mkdocs.__main__ import build_command
 from selectolax.lexbor import LexborHTMLParser
 
+from mkdocs_glightbox.headers import read_headers
+from mkdocs_glightbox.jobs import ImageJobs
+from mkdocs_glightbox.placeholders import Image
+from mkdocs_glightbox.tiles import make_tiles
+
 # ##################################
 # ######## Globals #################
 # ##################################
@@ -57,11 +64,12 @@ def setup_clean_mkdocs_folder(
     return testproject_path
 
 
-def build_docs_setup(testproject_path: str):
+def build_docs_setup(testproject_path: str, args: list = None):
     """
     Runs the `mkdocs build` command
     Args:
         testproject_path (Path): Path to test project
+        args (list): Extra command line arguments, e.g. ["--strict"]
     Returns:
         command: Object with results of command
     """
@@ -72,7 +80,7 @@ def build_docs_setup(testproject_path: str):
 
     try:
         runner = CliRunner()
-        run = runner.invoke(build_command)
+        run = runner.invoke(build_command, args)
         os.chdir(cwd)
         return run
     except:
@@ -427,6 +435,10 @@ def test_caption(tmp_path):
         tree.css_first("img[alt='image-figure']"),
         **{"data-description": "data-description", "data-title": "data-title"},
     )
+    validate_lightbox_wrap(
+        tree.css_first("img[alt='image-selector']"),
+        **{"data-description": ".custom-desc", "data-title": "data-title"},
+    )
 
 
 def test_auto_caption_by_page(tmp_path):
@@ -663,3 +675,461 @@ def test_edge_cases(tmp_path):
         f"tests/fixtures/{mkdocs_file}",
         docs_path="tests/fixtures/edge_cases_docs",
     )
+
+
+def test_inventory(tmp_path):
+    """
+    Validate image inventory and size budgets
+    """
+    mkdocs_file = "mkdocs-inventory.yml"
+    testproject_path = validate_mkdocs_file(tmp_path, f"tests/fixtures/{mkdocs_file}")
+    inventory = json.loads(
+        (testproject_path / "site/inventory.json").read_text(encoding="utf8")
+    )
+    assert {
+        "page": "",
+        "href": "img.png",
+        "gallery": "",
+        "size": os.path.getsize("tests/fixtures/docs/img.png"),
+        "width": 320,
+        "height": 320,
+    } in inventory
+    assert {
+        "page": "gallery/",
+        "href": "../another-img.png",
+        "gallery": "2",
+        "size": os.path.getsize("tests/fixtures/docs/another-img.png"),
+        "width": 200,
+        "height": 200,
+    } in inventory
+    external = [r for r in inventory if r["href"].startswith("https://")]
+    assert external
+    assert all(r["size"] is None and r["width"] is None for r in external)
+
+    # images over budget fail the build in strict mode
+    result = build_docs_setup(testproject_path, ["--strict"])
+    assert result.exit_code != 0
+    assert "over the image_size_budget of 1 KB" in result.output
+    assert "over the page_size_budget of 1 KB" in result.output
+
+
+def test_stats(tmp_path):
+    """
+    Validate build stats export
+    """
+    mkdocs_file = "mkdocs-stats.yml"
+    testproject_path = validate_mkdocs_file(tmp_path, f"tests/fixtures/{mkdocs_file}")
+    stats = json.loads(
+        (testproject_path / "site/stats.json").read_text(encoding="utf8")
+    )
+    pages = len(list((testproject_path / "docs").rglob("*.md")))
+    assert stats["hooks"]["on_page_content"]["calls"] == pages
+    assert stats["hooks"]["on_post_page"]["calls"] == pages
+    assert stats["hooks"]["on_post_build"]["calls"] == 1
+    for entry in stats["hooks"].values():
+        assert entry["wall"] >= 0 and entry["cpu"] >= 0
+    assert set(stats["steps"]) == {"parse", "serialize"}
+    images = stats["images"]
+    assert images["wrapped"] > 0
+    assert images["skipped"]["anchor"] >= 1
+    assert images["skipped"]["class"] >= 1
+    assert images["seen"] == images["wrapped"] + sum(images["skipped"].values())
+    assert stats["html_bytes_added"] > 0
+    assert len(stats["slowest_pages"]) == 3
+
+
+def test_privacy_href_build(tmp_path, monkeypatch):
+    """
+    Set anchor href at build time after the material privacy plugin
+    """
+    from material.plugins.privacy import plugin as privacy_plugin
+
+    class Response:
+        headers = {"content-type": "image/png"}
+        content = b"\x89PNG\r\n\x1a\n"
+
+        def raise_for_status(self):
+            pass
+
+    # external images are localized without network access
+    monkeypatch.setattr(
+        privacy_plugin.requests, "get", lambda *args, **kwargs: Response()
+    )
+    mkdocs_file = "mkdocs-material-privacy-build.yml"
+    testproject_path = validate_mkdocs_file(tmp_path, f"tests/fixtures/{mkdocs_file}")
+    file = testproject_path / "site/url/index.html"
+    tree = LexborHTMLParser(file.read_text(encoding="utf8"))
+    validate_static(tree, path="../")
+    validate_script(tree)
+    local_src = "../assets/external/dummyimage.com/600x400/bdc3c7/fff.png"
+    validate_lightbox_wrap(tree.css_first("img[alt='image']"), href=local_src)
+    assert (testproject_path / "site/assets/external/dummyimage.com").exists()
+    script = tree.css_first("script#init-glightbox")
+    assert "document.querySelectorAll('.glightbox')" not in script.text()
+
+    file = testproject_path / "site/index.html"
+    tree = LexborHTMLParser(file.read_text(encoding="utf8"))
+    validate_lightbox_wrap(tree.css_first("img[alt='image']"), href="img.png")
+
+
+def test_css_engine(tmp_path):
+    """
+    Validate the css engine without GLightbox javascript
+    """
+    mkdocs_file = "mkdocs-css-engine.yml"
+    testproject_path = validate_mkdocs_file(tmp_path, f"tests/fixtures/{mkdocs_file}")
+    stylesheet = testproject_path / "site/assets/stylesheets/glightbox-css.css"
+    assert stylesheet.exists()
+    assert not (testproject_path / "site/assets/javascripts/glightbox.min.js").exists()
+    assert ".glightbox-desc {" in stylesheet.read_text(encoding="utf8")
+    # neither placeholders nor tiles are made for the overlays
+    assert not (testproject_path / ".cache/plugin/glightbox").exists()
+
+    file = testproject_path / "site/gallery/index.html"
+    tree = LexborHTMLParser(file.read_text(encoding="utf8"))
+    validate_static(tree, path="../", exist=False)
+    validate_script(tree, exist=False)
+    assert tree.css_first(
+        'link[href="../assets/stylesheets/glightbox-css.css"][rel="stylesheet"]'
+    )
+    for index, alt in enumerate(["image-a", "image-b", "image-c", "image-d"]):
+        validate_lightbox_wrap(
+            tree.css_first(f"img[alt='{alt}']"), href=f"#glb-{index}"
+        )
+        overlay = tree.css_first(f".glightbox-css #glb-{index}")
+        assert overlay.css_first("a.glb-close").attrs["href"] == f"#glb-img-{index}"
+        assert overlay.css_first("figure img").attrs["alt"] == alt
+    # galleries are linked in a loop
+    for index, target in [(0, 1), (1, 0), (2, 3), (3, 2)]:
+        overlay = tree.css_first(f"#glb-{index}")
+        assert overlay.css_first("a.glb-next").attrs["href"] == f"#glb-{target}"
+        assert overlay.css_first("a.glb-prev").attrs["href"] == f"#glb-{target}"
+    assert tree.css_first("#glb-0 figure img").attrs["src"] == "../img.png"
+    assert tree.css_first("#glb-2 figure img").attrs["src"] == "../another-img.png"
+
+    file = testproject_path / "site/caption/index.html"
+    tree = LexborHTMLParser(file.read_text(encoding="utf8"))
+    overlay = tree.css_first("#glb-1")
+    assert "glb-desc-right" in overlay.attrs["class"]
+    assert overlay.css_first("figcaption .glb-title").text() == "data-title"
+    assert "data-description" in overlay.css_first("figcaption").text()
+    # selector descriptions are copied from the page
+    description = tree.css_first("#glb-3 figcaption .glb-description")
+    assert description.css_first("em").text() == "description"
+    assert ".custom-desc" not in tree.css_first("#glb-3 figcaption").text()
+    # an empty caption position is the default one
+    assert "glb-desc-bottom" in tree.css_first("#glb-4").attrs["class"]
+
+
+def test_bundle(tmp_path):
+    """
+    Validate the GLightbox stylesheet trimmed to the used features
+    """
+    with open("mkdocs_glightbox/glightbox/glightbox.min.css", encoding="utf8") as f:
+        vendored = f.read()
+    stylesheet = "site/assets/stylesheets/glightbox.min.css"
+
+    # the stylesheet is copied as is by default
+    testproject_path = validate_mkdocs_file(
+        tmp_path / "full",
+        "tests/fixtures/mkdocs-bundle.yml",
+        docs_path="tests/fixtures/bundle_docs",
+    )
+    assert (testproject_path / stylesheet).read_text(encoding="utf8") == vendored
+
+    # a page has a lightbox element which is not an image
+    testproject_path = validate_mkdocs_file(
+        tmp_path / "auto", "tests/fixtures/mkdocs-bundle-auto-rich.yml"
+    )
+    assert (testproject_path / stylesheet).read_text(encoding="utf8") == vendored
+
+    # only images
+    testproject_path = validate_mkdocs_file(
+        tmp_path / "auto-images",
+        "tests/fixtures/mkdocs-bundle-auto.yml",
+        docs_path="tests/fixtures/bundle_docs",
+    )
+    css = (testproject_path / stylesheet).read_text(encoding="utf8")
+    assert len(css) < len(vendored)
+    for selector in [".gvideo", "iframe", ".gslide-inline", ".desc-right"]:
+        assert selector not in css
+    for selector in [".gzoomIn", ".gslideInLeft", ".gfadeIn", ".desc-bottom"]:
+        assert selector in css
+
+    testproject_path = validate_mkdocs_file(
+        tmp_path / "slim", "tests/fixtures/mkdocs-bundle-slim.yml"
+    )
+    css = (testproject_path / stylesheet).read_text(encoding="utf8")
+    for selector in [".gzoomIn", ".gslideInLeft", ".desc-left", ".desc-top"]:
+        assert selector not in css
+    for selector in [".gfadeIn", ".desc-bottom", ".desc-right", ".gvideo"]:
+        assert selector in css
+
+
+@pytest.mark.skipif(Image is None, reason="Pillow is not installed")
+def test_placeholder(tmp_path):
+    """
+    Validate placeholders of local images, cached by file hash
+    """
+    mkdocs_file = "mkdocs-placeholder.yml"
+    testproject_path = validate_mkdocs_file(tmp_path, f"tests/fixtures/{mkdocs_file}")
+    file = testproject_path / "site/index.html"
+    tree = LexborHTMLParser(file.read_text(encoding="utf8"))
+    placeholder = tree.css_first("img[alt='image']").parent.attrs["data-placeholder"]
+    assert placeholder.startswith("data:image/")
+    assert len(placeholder) < 2048
+    # no placeholder for external images
+    assert "data-placeholder" not in tree.css_first("img[alt='img-tag']").parent.attrs
+    assert "slide_before_load" in tree.css_first("#init-glightbox").text()
+    assert tree.css_first("#glightbox-style").text().count(".glightbox-placeholder")
+
+    # unchanged images are read from the cache
+    cache_dir = testproject_path / ".cache/plugin/glightbox"
+    cache_files = list(cache_dir.glob("placeholder-*.txt"))
+    assert cache_files
+    for cache_file in cache_files:
+        cache_file.write_text("data:image/png;base64,cached", encoding="utf8")
+    result = build_docs_setup(testproject_path)
+    assert result.exit_code == 0
+    tree = LexborHTMLParser(file.read_text(encoding="utf8"))
+    placeholder = tree.css_first("img[alt='image']").parent.attrs["data-placeholder"]
+    assert placeholder == "data:image/png;base64,cached"
+
+
+@pytest.mark.skipif(Image is None, reason="Pillow is not installed")
+def test_deep_zoom(tmp_path):
+    """
+    Validate large images are opened in the deep zoom viewer with their tiles
+    """
+    mkdocs_file = "mkdocs-deep-zoom.yml"
+    testproject_path = validate_mkdocs_file(tmp_path, f"tests/fixtures/{mkdocs_file}")
+    site_path = testproject_path / "site"
+    assert (site_path / "assets/glightbox/deep-zoom.html").exists()
+
+    file = site_path / "gallery/index.html"
+    tree = LexborHTMLParser(file.read_text(encoding="utf8"))
+    # img.png is 320x320, another-img.png 200x200
+    anchor = tree.css_first("img[alt='image-a']").parent
+    assert anchor.attrs["data-type"] == "external"
+    href = anchor.attrs["href"]
+    assert href.startswith("../assets/glightbox/deep-zoom.html?dzi=tiles/")
+    validate_lightbox_wrap(
+        tree.css_first("img[alt='image-c']"), href="../another-img.png"
+    )
+
+    dzi_path = site_path / "assets/glightbox" / href.split("?dzi=")[1]
+    assert 'Width="320" Height="320"' in dzi_path.read_text(encoding="utf8")
+    tiles_path = dzi_path.with_name("image_files")
+    assert sorted(p.name for p in (tiles_path / "9").iterdir()) == [
+        "0_0.png",
+        "0_1.png",
+        "1_0.png",
+        "1_1.png",
+    ]
+    assert [p.name for p in (tiles_path / "0").iterdir()] == ["0_0.png"]
+
+    # iframe slides need the full stylesheet
+    with open("mkdocs_glightbox/glightbox/glightbox.min.css", encoding="utf8") as f:
+        assert (site_path / "assets/stylesheets/glightbox.min.css").read_text(
+            encoding="utf8"
+        ) == f.read()
+
+    # unchanged images are not tiled again
+    cache_tile = next(
+        (testproject_path / ".cache/plugin/glightbox/tiles").rglob("*.png")
+    )
+    mtime = cache_tile.stat().st_mtime_ns
+    result = build_docs_setup(testproject_path)
+    assert result.exit_code == 0
+    assert cache_tile.stat().st_mtime_ns == mtime
+
+
+@pytest.mark.skipif(Image is None, reason="Pillow is not installed")
+def test_deep_zoom_pixel_limit(tmp_path, monkeypatch):
+    """
+    Validate the decompression bomb limit of Pillow is kept while tiling
+    """
+    # img.png is 320x320, 102400 pixels
+    monkeypatch.setattr(Image, "MAX_IMAGE_PIXELS", 40000)
+    assert make_tiles("tests/fixtures/docs/img.png", str(tmp_path), 300) is None
+
+    monkeypatch.setattr(Image, "MAX_IMAGE_PIXELS", 70000)
+    assert make_tiles("tests/fixtures/docs/img.png", str(tmp_path), 300)
+    assert Image.MAX_IMAGE_PIXELS == 70000
+
+
+@pytest.mark.skipif(Image is None, reason="Pillow is not installed")
+def test_deep_zoom_formats(tmp_path, monkeypatch, caplog):
+    """
+    Validate scans in formats without a header reader are sized by Pillow
+    """
+    cache_dir = str(tmp_path / "cache")
+    with Image.open("tests/fixtures/docs/img.png") as image:
+        for image_format in ("tiff", "bmp"):
+            path = tmp_path / f"img.{image_format}"
+            image.convert("RGB").save(path)
+            name = make_tiles(str(path), cache_dir, 300)
+            dzi = tmp_path / "cache/tiles" / name / "image.dzi"
+            assert 'Width="320" Height="320"' in dzi.read_text(encoding="utf8")
+
+    # over twice the limit of Pillow
+    monkeypatch.setattr(Image, "MAX_IMAGE_PIXELS", 40000)
+    assert make_tiles(str(tmp_path / "img.tiff"), cache_dir, 300) is None
+
+    unknown = tmp_path / "img.xyz"
+    unknown.write_bytes(b"not an image")
+    with caplog.at_level(logging.DEBUG, logger="mkdocs.plugins.mkdocs_glightbox"):
+        assert make_tiles(str(unknown), cache_dir, 300) is None
+    assert "unknown image format" in caplog.text
+
+
+def test_service_worker(tmp_path):
+    """
+    Validate the service worker and its registration
+    """
+    mkdocs_file = "mkdocs-service-worker.yml"
+    testproject_path = validate_mkdocs_file(tmp_path, f"tests/fixtures/{mkdocs_file}")
+    service_worker = testproject_path / "site/glightbox-sw.js"
+    text = service_worker.read_text(encoding="utf8")
+    assert (
+        'const PRECACHE = ["assets/stylesheets/glightbox.min.css", '
+        '"assets/javascripts/glightbox.min.js"];' in text
+    )
+    assert f"const MAX_IMAGE_BYTES = {10 * 1024 * 1024};" in text
+    version = re.search(r'const VERSION = "(.+)";', text).group(1)
+    assert re.fullmatch(r"[\w.]+-[0-9a-f]{12}", version)
+
+    file = testproject_path / "site/gallery/index.html"
+    tree = LexborHTMLParser(file.read_text(encoding="utf8"))
+    script = tree.css_first("#init-glightbox").text()
+    assert "navigator.serviceWorker.register('../glightbox-sw.js')" in script
+    assert "glightbox-cache" in script
+
+    # the caches are renewed when the assets change
+    mkdocs_yml = testproject_path / "mkdocs.yml"
+    mkdocs_yml.write_text(
+        mkdocs_yml.read_text(encoding="utf8")
+        + "        bundle: slim\n        headers: _headers\n",
+        encoding="utf8",
+    )
+    result = build_docs_setup(testproject_path)
+    assert result.exit_code == 0
+    text = service_worker.read_text(encoding="utf8")
+    assert re.search(r'const VERSION = "(.+)";', text).group(1) != version
+
+    # immutable assets are precached by their versioned url, as linked
+    tree = LexborHTMLParser(file.read_text(encoding="utf8"))
+    css_href = tree.css_first("link[href*='glightbox.min.css']").attrs["href"]
+    js_src = tree.css_first("script[src*='glightbox.min.js']").attrs["src"]
+    assert "?v=" in css_href
+    precache = json.loads(re.search(r"const PRECACHE = (.+);", text).group(1))
+    assert precache == [css_href[3:], js_src[3:]]
+
+    # a worker registered by an earlier build unregisters itself on request
+    mkdocs_yml.write_text(
+        mkdocs_yml.read_text(encoding="utf8").replace(
+            "service_worker: true", "service_worker: unregister"
+        ),
+        encoding="utf8",
+    )
+    result = build_docs_setup(testproject_path)
+    assert result.exit_code == 0
+    text = service_worker.read_text(encoding="utf8")
+    assert "self.registration.unregister()" in text
+    assert "PRECACHE" not in text
+    tree = LexborHTMLParser(file.read_text(encoding="utf8"))
+    assert "serviceWorker" not in tree.css_first("#init-glightbox").text()
+
+    # no worker is written by default
+    mkdocs_yml.write_text(
+        mkdocs_yml.read_text(encoding="utf8").replace(
+            "service_worker: unregister", "service_worker: false"
+        ),
+        encoding="utf8",
+    )
+    result = build_docs_setup(testproject_path)
+    assert result.exit_code == 0
+    assert not service_worker.exists()
+
+
+def test_headers(tmp_path):
+    """
+    Validate the headers manifest for static hosts
+    """
+    mkdocs_file = "mkdocs-headers.yml"
+    testproject_path = validate_mkdocs_file(tmp_path, f"tests/fixtures/{mkdocs_file}")
+    manifest = testproject_path / "site/_headers"
+    rules = read_headers(manifest.read_text(encoding="utf8"))
+    immutable = "Cache-Control: public, max-age=31536000, immutable"
+    assert rules["/docs/assets/stylesheets/glightbox.min.css"] == [immutable]
+    assert rules["/docs/assets/javascripts/glightbox.min.js"] == [immutable]
+
+    # assets are preloaded by their versioned url, as linked by the page
+    file = testproject_path / "site/gallery/index.html"
+    tree = LexborHTMLParser(file.read_text(encoding="utf8"))
+    css_href = tree.css_first("link[href*='glightbox.min.css']").attrs["href"]
+    js_src = tree.css_first("script[src*='glightbox.min.js']").attrs["src"]
+    assert re.fullmatch(
+        r"\.\./assets/stylesheets/glightbox\.min\.css\?v=\w{12}", css_href
+    )
+    assert rules["/docs/gallery/"] == [
+        f"Link: </docs/{css_href[3:]}>; rel=preload; as=style, "
+        f"</docs/{js_src[3:]}>; rel=preload; as=script"
+    ]
+    assert "/docs/" in rules
+    # pages without wrapped images
+    assert "/docs/disable_by_page/" not in rules
+    assert "/docs/image_in_anchor/" not in rules
+
+    # added to the manifest of the docs, the block of an earlier build replaced
+    docs_headers = (
+        "# security\n/*\n  X-Frame-Options: DENY\n\n/docs/gallery/\n  X-Test: 1\n"
+    )
+    (testproject_path / "docs/_headers").write_text(
+        docs_headers
+        + "# mkdocs-glightbox start\n/docs/old/\n  X-Old: 1\n"
+        + "# mkdocs-glightbox end\n# footer\n",
+        encoding="utf8",
+    )
+    result = build_docs_setup(testproject_path)
+    assert result.exit_code == 0
+    text = manifest.read_text(encoding="utf8")
+    assert text.startswith(docs_headers + "# mkdocs-glightbox start\n")
+    assert text.endswith("# mkdocs-glightbox end\n# footer\n")
+    assert text.count("# mkdocs-glightbox start") == 1
+    assert "/docs/old/" not in text
+    merged = read_headers(text)
+    assert merged["/*"] == ["X-Frame-Options: DENY"]
+    assert merged["/docs/gallery/"] == ["X-Test: 1"] + rules["/docs/gallery/"]
+    assert merged["/docs/assets/javascripts/glightbox.min.js"] == [immutable]
+
+
+def test_image_jobs():
+    """
+    Validate the image jobs run once per key with bounded pending jobs
+    """
+    jobs = ImageJobs(workers=2, max_pending=2)
+    # without a started pool, jobs run inline
+    assert jobs.submit("inline", len, "abc").result() == 3
+
+    def job(index):
+        time.sleep(0.001)
+        return index * 2
+
+    jobs.start()
+    futures = []
+    pending = []
+    for index in range(30):
+        futures.append(jobs.submit(index % 10, job, index % 10))
+        pending.append(sum(not future.done() for future in set(futures)))
+    jobs.join()
+    assert [future.result() for future in futures] == [i % 10 * 2 for i in range(30)]
+    # same key, same job
+    assert len({id(future) for future in futures}) == 10
+    assert max(pending) <= 2
+
+    # errors of the jobs are raised when joined
+    jobs.start()
+    jobs.submit("error", os.path.getsize, "missing.png")
+    with pytest.raises(OSError):
+        jobs.join()
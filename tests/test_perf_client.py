@@ -0,0 +1,181 @@
+"""
+Client-side benchmarks of the lightbox in a headless browser
+
+Sites with an increasing amount of images are built and served locally. For
+each page load the following metrics are collected and stored in the
+benchmark extra_info, so runs can be compared with --benchmark-compare:
+
+- script: time from the end of the glightbox.min.js download until the
+  script has been evaluated
+- init: time spent in GLightbox(...)
+- first_open: time from clicking the first image until its slide is shown
+- reload: time spent in lightbox.reload(), as called after instant navigation
+- transferred: bytes transferred for the page and all its resources, and for
+  the GLightbox assets alone
+
+Requires the browsers of Playwright: playwright install chromium
+"""
+
+import functools
+import http.server
+import shutil
+import statistics
+import threading
+
+import pytest
+
+pytest.importorskip("playwright")
+
+from .test_builds import build_docs_setup  # noqa: E402
+
+pytestmark = [pytest.mark.perf, pytest.mark.e2e]
+
+IMAGE_COUNTS = [10, 100, 1000, 5000]
+ROUNDS = 5
+
+MKDOCS_YML = """site_name: client benchmark
+use_directory_urls: true
+
+theme:
+  name: material
+
+plugins:
+  - glightbox
+"""
+
+# Wrap GLightbox when the UMD bundle assigns it to window, to know when the
+# script has been evaluated and how long the initialization takes
+INSTRUMENTATION = """
+window.__glb = {};
+Object.defineProperty(window, "GLightbox", {
+  configurable: true,
+  set(factory) {
+    window.__glb.evaluated = performance.now();
+    Object.defineProperty(window, "GLightbox", {
+      configurable: true,
+      writable: true,
+      value: function (options) {
+        const start = performance.now();
+        const instance = factory(options);
+        window.__glb.init = performance.now() - start;
+        return instance;
+      },
+    });
+  },
+});
+"""
+
+COLLECT = """() => {
+  const script = performance
+    .getEntriesByType("resource")
+    .find((entry) => entry.name.endsWith("glightbox.min.js"));
+  const resources = performance.getEntriesByType("resource");
+  const navigation = performance.getEntriesByType("navigation")[0];
+  const start = performance.now();
+  lightbox.reload();
+  return {
+    script: window.__glb.evaluated - script.responseEnd,
+    init: window.__glb.init,
+    reload: performance.now() - start,
+    transferred: resources.reduce(
+      (sum, entry) => sum + entry.transferSize,
+      navigation.transferSize
+    ),
+    transferred_glightbox: resources
+      .filter((entry) => entry.name.includes("glightbox"))
+      .reduce((sum, entry) => sum + entry.transferSize, 0),
+  };
+}"""
+
+FIRST_OPEN = """async () => {
+  const start = performance.now();
+  document.querySelector("a.glightbox").click();
+  await new Promise((resolve) => {
+    const check = () => {
+      const img = document.querySelector(".gslide.current .gslide-image img");
+      if (img && img.complete && img.naturalWidth) {
+        resolve();
+      } else {
+        requestAnimationFrame(check);
+      }
+    };
+    check();
+  });
+  return performance.now() - start;
+}"""
+
+# ##################################
+# ########## Helpers ###############
+# ##################################
+
+
+def build_site(path, image_count):
+    docs_path = path / "docs"
+    docs_path.mkdir(parents=True)
+    shutil.copyfile("tests/fixtures/docs/img.png", docs_path / "img.png")
+    (docs_path / "index.md").write_text(
+        "# Images\n\n"
+        + "\n\n".join(f"![image-{i}](img.png)" for i in range(image_count)),
+        encoding="utf8",
+    )
+    (path / "mkdocs.yml").write_text(MKDOCS_YML, encoding="utf8")
+    result = build_docs_setup(path)
+    assert result.exit_code == 0, result.stdout
+    return path / "site"
+
+
+class QuietHandler(http.server.SimpleHTTPRequestHandler):
+    def log_message(self, format, *args):
+        pass
+
+
+@pytest.fixture(scope="module")
+def serve(tmp_path_factory):
+    """Build and serve sites from a local static server, by image count"""
+    servers = []
+
+    def _serve(image_count):
+        site_path = build_site(
+            tmp_path_factory.mktemp(f"site{image_count}"), image_count
+        )
+        handler = functools.partial(QuietHandler, directory=str(site_path))
+        server = http.server.ThreadingHTTPServer(("127.0.0.1", 0), handler)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        servers.append(server)
+        return f"http://127.0.0.1:{server.server_port}/"
+
+    yield _serve
+    for server in servers:
+        server.shutdown()
+
+
+# ##################################
+# ########### Tests ################
+# ##################################
+
+
+@pytest.mark.benchmark(group="client")
+@pytest.mark.parametrize("image_count", IMAGE_COUNTS)
+def test_client_performance(benchmark, browser, serve, image_count):
+    url = serve(image_count)
+    samples = []
+
+    def load():
+        # a new context per round for a cold cache
+        context = browser.new_context()
+        context.add_init_script(INSTRUMENTATION)
+        page = context.new_page()
+        try:
+            page.goto(url, wait_until="load")
+            metrics = page.evaluate(COLLECT)
+            metrics["first_open"] = page.evaluate(FIRST_OPEN)
+            samples.append(metrics)
+        finally:
+            context.close()
+
+    benchmark.pedantic(load, rounds=ROUNDS, iterations=1, warmup_rounds=1)
+
+    samples = samples[-ROUNDS:]  # without the warmup round
+    for key in samples[0]:
+        benchmark.extra_info[key] = statistics.median(s[key] for s in samples)
+    assert benchmark.extra_info["transferred_glightbox"] > 0
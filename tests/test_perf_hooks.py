@@ -0,0 +1,160 @@
+"""
+Micro-benchmarks of the plugin hooks over a synthetic HTML corpus
+
+The hooks are called directly, so MkDocs and Markdown rendering are not part
+of the measurement. Save a baseline and compare the following runs against it:
+
+    pytest tests/test_perf_hooks.py -m perf --benchmark-autosave
+    pytest tests/test_perf_hooks.py -m perf --benchmark-compare --benchmark-compare-fail=mean:20%
+"""
+
+import random
+import tracemalloc
+
+import pytest
+from mkdocs.config import load_config
+from mkdocs.structure.files import File
+from mkdocs.structure.pages import Page
+
+pytestmark = pytest.mark.perf
+
+# ##################################
+# ######## Corpus ##################
+# ##################################
+
+SCENARIOS = {
+    "small": dict(paragraphs=20, images=5),
+    "medium": dict(paragraphs=200, images=50),
+    "large": dict(paragraphs=2000, images=500),
+    "image-heavy": dict(paragraphs=50, images=1000),
+    "emoji-dense": dict(paragraphs=200, images=50, emoji=5),
+    "nested-anchors": dict(paragraphs=200, images=50, nested_anchors=0.5),
+    "manual": dict(paragraphs=200, images=50, config="mkdocs-manual.yml"),
+    "privacy": dict(paragraphs=200, images=50, config="mkdocs-material-privacy.yml"),
+    "privacy-build": dict(
+        paragraphs=200, images=50, config="mkdocs-material-privacy-build.yml"
+    ),
+}
+
+TEXT = (
+    "Lorem ipsum dolor sit amet, <strong>consectetur</strong> adipiscing elit, "
+    'sed do <a href="../other/">eiusmod</a> tempor incididunt ut labore et '
+    "dolore <code>magna</code> aliqua."
+)
+EMOJI = (
+    '<img alt="😄" class="twemoji" title=":smile:" '
+    'src="https://cdn.jsdelivr.net/gh/jdecked/twemoji@15.0.3/assets/svg/1f604.svg">'
+)
+
+
+def generate_content(paragraphs, images, emoji=0, nested_anchors=0.0, seed=0, **_):
+    """
+    Generate page content as rendered by Markdown, with images spread between
+    the paragraphs. Some images use captions and galleries, a ratio of them is
+    already wrapped by an anchor, and each paragraph holds some emoji images.
+    """
+    rng = random.Random(seed)
+    image_at = set(rng.sample(range(paragraphs + images), images))
+    parts = ["<h1>Benchmark</h1>"]
+    image_index = 0
+    for i in range(paragraphs + images):
+        if i not in image_at:
+            parts.append(f"<p>{TEXT}{EMOJI * emoji}</p>")
+            continue
+        attrs = f'alt="image-{image_index}" src="../img.png"'
+        if image_index % 3 == 0:
+            attrs += ' data-title="title" data-description="description"'
+        if image_index % 5 == 0:
+            attrs += f' data-gallery="{image_index % 4}"'
+        if image_index % 7 == 0:
+            attrs += ' class="on-glb"'
+        img = f"<img {attrs} />"
+        if rng.random() < nested_anchors:
+            img = f'<a href="https://example.com">{img}</a>'
+        parts.append(f"<p>{img}</p>")
+        image_index += 1
+    return "\n".join(parts)
+
+
+def generate_page(content):
+    return (
+        '<!doctype html><html lang="en"><head><meta charset="utf-8">'
+        "<title>Benchmark</title></head><body><div class="
+        f'"md-content"><article>{content}</article></div></body></html>'
+    )
+
+
+# ##################################
+# ########## Helpers ###############
+# ##################################
+
+
+def setup_plugin(scenario):
+    options = SCENARIOS[scenario]
+    config = load_config(f"tests/fixtures/{options.get('config', 'mkdocs.yml')}")
+    plugin = config.plugins["glightbox"]
+    plugin.on_config(config)
+    file = File("bench.md", config.docs_dir, config.site_dir, config.use_directory_urls)
+    page = Page(None, file, config)
+    page.meta = {}
+    return plugin, page, config, generate_content(**options)
+
+
+def post_page(plugin, output, **kwargs):
+    """Run the handlers the plugin registers for the post page event in order"""
+    for method in plugin.on_post_page.methods:
+        output = method(output, **kwargs)
+    return output
+
+
+def record_peak_memory(benchmark, func, *args, **kwargs):
+    """Store the peak memory of a single call, outside the timed rounds"""
+    tracemalloc.start()
+    try:
+        func(*args, **kwargs)
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    benchmark.extra_info["peak_memory"] = peak
+
+
+# ##################################
+# ########### Tests ################
+# ##################################
+
+
+@pytest.mark.benchmark(group="on_page_content")
+@pytest.mark.parametrize("scenario", SCENARIOS)
+def test_on_page_content(benchmark, scenario):
+    plugin, page, config, html = setup_plugin(scenario)
+    record_peak_memory(
+        benchmark, plugin.on_page_content, html, page=page, config=config
+    )
+    result = benchmark(plugin.on_page_content, html, page=page, config=config)
+    assert 'class="glightbox"' in result
+
+
+@pytest.mark.benchmark(group="wrap_img_with_anchor_selectolax")
+@pytest.mark.parametrize("scenario", SCENARIOS)
+def test_wrap_img_with_anchor_selectolax(benchmark, scenario):
+    plugin, page, config, html = setup_plugin(scenario)
+    kwargs = dict(
+        plugin_config=plugin.config,
+        meta=page.meta,
+        skip_classes=["emojione", "twemoji", "gemoji", "off-glb"],
+    )
+    record_peak_memory(
+        benchmark, plugin.wrap_img_with_anchor_selectolax, html, **kwargs
+    )
+    result = benchmark(plugin.wrap_img_with_anchor_selectolax, html, **kwargs)
+    assert 'class="glightbox"' in result
+
+
+@pytest.mark.benchmark(group="on_post_page")
+@pytest.mark.parametrize("scenario", SCENARIOS)
+def test_on_post_page(benchmark, scenario):
+    plugin, page, config, html = setup_plugin(scenario)
+    output = generate_page(plugin.on_page_content(html, page=page, config=config))
+    record_peak_memory(benchmark, post_page, plugin, output, page=page, config=config)
+    result = benchmark(post_page, plugin, output, page=page, config=config)
+    assert 'id="init-glightbox"' in result
@@ -0,0 +1,156 @@
+"""
+Soak benchmark of the rebuild cycles of `mkdocs serve`
+
+A large site is rebuilt many times the way `mkdocs serve` does it: the config
+is loaded again before each build and a page is touched in between. The time
+spent in the plugin hooks, the memory traced by tracemalloc and the RSS are
+recorded per rebuild, and their growth after the warmup cycles is bounded to
+catch leaks and slowdowns in the hot hooks.
+
+Set GLIGHTBOX_SOAK_CYCLES to run more rebuild cycles.
+"""
+
+import gc
+import logging
+import os
+import shutil
+import statistics
+import tracemalloc
+
+import pytest
+from mkdocs.commands.build import build
+from mkdocs.config import load_config
+
+pytestmark = pytest.mark.perf
+
+CYCLES = int(os.environ.get("GLIGHTBOX_SOAK_CYCLES", 20))
+WARMUP = 3
+PAGES = 100
+IMAGES_PER_PAGE = 20
+
+# upper bounds after the warmup cycles
+MAX_TRACED_GROWTH = 2 * 1024 * 1024
+MAX_RSS_GROWTH = 32 * 1024 * 1024
+MAX_PLUGIN_SLOWDOWN = 1.5
+
+MKDOCS_YML = """site_name: soak benchmark
+use_directory_urls: true
+
+markdown_extensions:
+  - attr_list
+
+plugins:
+  - glightbox:
+      stats: true
+      stats_slowest: 0
+"""
+
+# ##################################
+# ########## Helpers ###############
+# ##################################
+
+
+def setup_large_site(path):
+    docs_path = path / "docs"
+    docs_path.mkdir(parents=True)
+    shutil.copyfile("tests/fixtures/docs/img.png", docs_path / "img.png")
+    for page in range(PAGES):
+        (docs_path / f"page_{page}.md").write_text(
+            f"# Page {page}\n\n"
+            + "\n\n".join(
+                f'Paragraph {i}.\n\n![image-{i}](img.png){{data-gallery="{i % 3}"}}'
+                for i in range(IMAGES_PER_PAGE)
+            ),
+            encoding="utf8",
+        )
+    (docs_path / "index.md").write_text("# Index\n", encoding="utf8")
+    (path / "mkdocs.yml").write_text(MKDOCS_YML, encoding="utf8")
+    return path / "mkdocs.yml"
+
+
+def rss():
+    """Current resident set size in bytes, the peak where it is not available
+
+    RSS is not measured on Windows, which has no resource module.
+    """
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except OSError:
+        pass
+    try:
+        import resource
+    except ImportError:
+        return 0
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+
+# ##################################
+# ########### Tests ################
+# ##################################
+
+
+@pytest.mark.benchmark(group="serve")
+def test_serve_rebuilds(benchmark, tmp_path):
+    config_file = str(setup_large_site(tmp_path))
+    site_dir = str(tmp_path / "site")
+    touched = tmp_path / "docs" / "index.md"
+    cycles = []
+
+    def get_config():
+        config = load_config(config_file=config_file, site_dir=site_dir)
+        config.site_url = "http://127.0.0.1:8000/"
+        return config
+
+    def rebuild():
+        with touched.open("a", encoding="utf8") as f:
+            f.write(f"\nEdit {len(cycles)}.\n")
+        config = get_config()
+        build(config, serve_url=config.site_url)
+        stats = config.plugins["glightbox"].stats
+        plugin_time = sum(hook["wall"] for hook in stats.hooks.values())
+        del config, stats
+        gc.collect()
+        cycles.append(
+            {
+                "plugin_time": plugin_time,
+                "traced": tracemalloc.get_traced_memory()[0],
+                "rss": rss(),
+            }
+        )
+
+    startup_config = get_config()
+    startup_config.plugins.on_startup(command="serve", dirty=False)
+    mkdocs_log = logging.getLogger("mkdocs")
+    log_level = mkdocs_log.level
+    mkdocs_log.setLevel(logging.WARNING)
+    tracemalloc.start()
+    try:
+        benchmark.pedantic(rebuild, rounds=CYCLES, iterations=1)
+    finally:
+        tracemalloc.stop()
+        mkdocs_log.setLevel(log_level)
+        startup_config.plugins.on_shutdown()
+
+    warm = cycles[WARMUP:]
+    traced_growth = warm[-1]["traced"] - warm[0]["traced"]
+    rss_growth = warm[-1]["rss"] - warm[0]["rss"]
+    half = len(warm) // 2
+    early = statistics.median(c["plugin_time"] for c in warm[:half])
+    late = statistics.median(c["plugin_time"] for c in warm[half:])
+    benchmark.extra_info.update(
+        {
+            "plugin_time": [c["plugin_time"] for c in cycles],
+            "traced_growth": traced_growth,
+            "rss_growth": rss_growth,
+            "plugin_slowdown": late / early,
+        }
+    )
+    logging.info(
+        f"{CYCLES} rebuilds: traced memory growth {traced_growth} bytes, "
+        f"RSS growth {rss_growth} bytes, plugin time {early:.3f}s -> {late:.3f}s"
+    )
+
+    assert traced_growth < MAX_TRACED_GROWTH
+    assert rss_growth < MAX_RSS_GROWTH
+    assert late < early * MAX_PLUGIN_SLOWDOWN